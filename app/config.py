@@ -9,16 +9,68 @@ class Settings(BaseSettings):
     refresh_interval_seconds: int = Field(
         60, description="Default refresh interval for metric polling on the frontend."
     )
-    sample_interval_seconds: int = Field(
-        60, description="How frequently to snapshot metrics into the database."
+    sample_interval_seconds: float = Field(
+        60,
+        description=(
+            "How frequently to snapshot metrics into the database. Fractions are "
+            "allowed; intervals below ~0.05s may not be achievable."
+        ),
+    )
+    collector_flush_every_ticks: int = Field(
+        1,
+        description=(
+            "Buffer this many collection ticks before writing them in one "
+            "transaction. Buffered samples are lost if the process crashes."
+        ),
+    )
+    collector_flush_interval_seconds: float = Field(
+        300,
+        description="Write buffered samples at least this often, in seconds.",
+    )
+    collector_max_buffered_rows: int = Field(
+        10_000,
+        description=(
+            "Keep at most this many unwritten samples while the database is "
+            "failing; the oldest are dropped first."
+        ),
+    )
+    collector_max_skip_ticks: int = Field(
+        0,
+        description=(
+            "Skip storing a sample whose data is unchanged from the previous one, "
+            "for at most this many ticks in a row. 0 stores every sample."
+        ),
+    )
+    collect_in_thread: bool = Field(
+        True,
+        description=(
+            "Run metric providers in worker threads; disable when every provider "
+            "is cheap and non-blocking."
+        ),
     )
     history_points_limit: int = Field(
         120, description="Number of historical samples to return for charting."
     )
+    raw_retention_hours: float = Field(
+        24, description="Keep every collected sample for this many hours."
+    )
+    minute_retention_days: float = Field(
+        7,
+        description=(
+            "Keep one sample per minute for this many days; older samples are "
+            "thinned to one per hour."
+        ),
+    )
+    retention_interval_seconds: int = Field(
+        3600, description="How frequently to prune samples past their retention."
+    )
     database_url: str = Field(
         "sqlite+aiosqlite:///./data/home_dash.db", description="SQLAlchemy database URL."
     )
     sqlalchemy_echo: bool = Field(False, description="Enable SQL echo logging.")
+    database_reader_pool_size: int = Field(
+        8, description="Number of pooled read connections used by API requests."
+    )
 
     @field_validator("database_url")
     def ensure_sqlite_directory(cls, value: str) -> str:
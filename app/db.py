@@ -1,8 +1,17 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import AsyncGenerator
-
+from typing import Any, AsyncGenerator, Dict
+
+from sqlalchemy import (
+    Connection,
+    DateTime,
+    Inspector,
+    event,
+    inspect,
+    make_url,
+    text,
+)
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -10,6 +19,7 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase, declared_attr
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .config import settings
 
@@ -32,25 +42,155 @@ def _ensure_sqlite_directory(database_url: str) -> None:
 
 _ensure_sqlite_directory(settings.database_url)
 
-engine: AsyncEngine = create_async_engine(
-    settings.database_url,
-    echo=settings.sqlalchemy_echo,
-    future=True,
+# Applied to every new SQLite connection: WAL lets API readers run alongside the
+# collector's writes, and the cache/mmap sizes keep the working set in memory.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _is_file_database(database_url: str) -> bool:
+    return make_url(database_url).database not in (None, "", ":memory:")
+
+
+def _create_engine(pool_size: int) -> AsyncEngine:
+    options: Dict[str, Any] = {}
+    # aiosqlite defaults to NullPool for file databases, which reopens the file
+    # (and discards SQLite's page cache) on every checkout.
+    if _is_file_database(settings.database_url):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=0
+        )
+    created = create_async_engine(
+        settings.database_url,
+        echo=settings.sqlalchemy_echo,
+        future=True,
+        **options,
+    )
+    if created.dialect.name == "sqlite":
+        event.listen(created.sync_engine, "connect", _apply_sqlite_pragmas)
+    return created
+
+
+# A single long-lived connection serializes writes from the collector. An
+# in-memory database only exists on its own connection, so readers share it.
+engine: AsyncEngine = _create_engine(pool_size=1)
+reader_engine: AsyncEngine = (
+    _create_engine(pool_size=settings.database_reader_pool_size)
+    if _is_file_database(settings.database_url)
+    else engine
 )
 
+# The collector only issues Core statements, so there is nothing to autoflush.
 SessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
-    engine, expire_on_commit=False
+    engine, autoflush=False, expire_on_commit=False
+)
+ReaderSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
+    reader_engine, expire_on_commit=False
 )
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with SessionLocal() as session:
+    async with ReaderSessionLocal() as session:
         yield session
 
 
+# Indexes created by earlier schema versions that have since been replaced.
+LEGACY_INDEXES = (
+    "ix_metric_samples_metric_id",
+    "ix_metric_samples_timestamp",
+)
+
+# (table, old column, new column) renames from earlier schema versions.
+LEGACY_COLUMN_RENAMES = (("metric_samples", "payload", "payload_json"),)
+
+# Earlier schema versions stored sample timestamps as SQLite datetime text;
+# they are now Unix epoch seconds.
+SQLITE_LEGACY_DATA_UPGRADES = (
+    "UPDATE metric_samples"
+    " SET timestamp = (julianday(timestamp) - 2440587.5) * 86400.0"
+    " WHERE typeof(timestamp) = 'text'",
+)
+
+# (table, column) pairs that earlier schema versions stored as timezone-aware
+# datetimes and that now hold Unix epoch seconds.
+LEGACY_EPOCH_COLUMNS = (("metric_samples", "timestamp"),)
+
+POSTGRESQL_EPOCH_UPGRADE = (
+    "ALTER TABLE {table} ALTER COLUMN {column}"
+    " TYPE double precision USING extract(epoch FROM {column})"
+)
+
+
+def _upgrade_legacy_epoch_columns(connection: Connection, inspector: Inspector) -> None:
+    dialect = connection.dialect.name
+    for table, column in LEGACY_EPOCH_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        column_types = {
+            reflected["name"]: reflected["type"]
+            for reflected in inspector.get_columns(table)
+        }
+        if not isinstance(column_types.get(column), DateTime):
+            continue
+        if dialect == "sqlite":
+            # SQLite keeps the declared type; the values are rewritten below.
+            continue
+        if dialect != "postgresql":
+            raise RuntimeError(
+                f"{table}.{column} still uses the legacy datetime type and cannot "
+                f"be upgraded automatically on {dialect}; convert it to Unix "
+                "epoch seconds (double precision) before starting."
+            )
+        connection.execute(
+            text(POSTGRESQL_EPOCH_UPGRADE.format(table=table, column=column))
+        )
+
+
+def _upgrade_legacy_schema(connection: Connection) -> None:
+    for index_name in LEGACY_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+    inspector = inspect(connection)
+    for table, old_column, new_column in LEGACY_COLUMN_RENAMES:
+        if not inspector.has_table(table):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if old_column in columns and new_column not in columns:
+            connection.execute(
+                text(f"ALTER TABLE {table} RENAME COLUMN {old_column} TO {new_column}")
+            )
+
+    _upgrade_legacy_epoch_columns(connection, inspector)
+    if connection.dialect.name == "sqlite" and inspector.has_table("metric_samples"):
+        for statement in SQLITE_LEGACY_DATA_UPGRADES:
+            connection.execute(text(statement))
+
+
+def _create_missing_indexes(connection: Connection) -> None:
+    # create_all skips indexes on tables that already exist.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
 async def init_db() -> None:
     from . import models  # noqa: F401  # ensure models are imported
 
     async with engine.begin() as conn:
+        await conn.run_sync(_upgrade_legacy_schema)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
 
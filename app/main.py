@@ -1,22 +1,42 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import defaultdict
 from contextlib import asynccontextmanager
-from dataclasses import asdict
-from typing import Any, Dict, List, Optional
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
 
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
-from fastapi.responses import RedirectResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import (
+    HTMLResponse,
+    ORJSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import select
+from sqlalchemy import select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Row
 
 from .config import settings
-from .db import SessionLocal, engine, get_session, init_db
+from .db import (
+    ReaderSessionLocal,
+    SessionLocal,
+    engine,
+    get_session,
+    init_db,
+    reader_engine,
+)
 from .metrics.registry import MetricRegistry
 from .metrics.system import DEFAULT_PROVIDERS
-from .models import MetricSample
+from .models import SAMPLE_COLUMNS, MetricSample, sample_to_dict
 from .services.collector import MetricCollector
+from .services.retention import RetentionPolicy
 
 templates = Jinja2Templates(directory="templates")
 registry = MetricRegistry()
@@ -27,8 +47,28 @@ collector = MetricCollector(
     registry=registry,
     session_factory=SessionLocal,
     interval_seconds=settings.sample_interval_seconds,
+    collect_in_thread=settings.collect_in_thread,
+    flush_every_ticks=settings.collector_flush_every_ticks,
+    flush_interval_seconds=settings.collector_flush_interval_seconds,
+    max_skip_ticks=settings.collector_max_skip_ticks,
+    max_buffered_rows=settings.collector_max_buffered_rows,
+    retention=RetentionPolicy(
+        raw_retention=timedelta(hours=settings.raw_retention_hours),
+        minute_retention=timedelta(days=settings.minute_retention_days),
+        interval_seconds=settings.retention_interval_seconds,
+    ),
 )
 
+# Serialized /api/metrics bodies keyed by query shape; each entry stores the
+# monotonic time it was built. Entries expire after one sample interval or as
+# soon as the collector writes a newer tick.
+_RESPONSE_CACHE: Dict[Tuple[Any, ...], Tuple[float, bytes]] = {}
+_RESPONSE_CACHE_LOCK = asyncio.Lock()
+
+# The dashboard only depends on settings and the registered providers, so it is
+# rendered once at startup rather than per request.
+_DASHBOARD_HTML: Optional[str] = None
+
 
 FAVICON_SVG = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">
 <rect width="64" height="64" rx="12" fill="#111827"/>
@@ -40,17 +80,26 @@ FAVICON_SVG = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global _DASHBOARD_HTML
     await init_db()
+    _DASHBOARD_HTML = _render_dashboard()
     await collector.collect_once()
     collector.start()
     try:
         yield
     finally:
         await collector.stop()
+        await reader_engine.dispose()
         await engine.dispose()
 
 
-app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app = FastAPI(
+    title=settings.app_name,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+# Metric payloads repeat the same keys in every sample and compress very well.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 def get_registry() -> MetricRegistry:
@@ -67,45 +116,124 @@ async def favicon() -> Response:
     return Response(content=FAVICON_SVG, media_type="image/svg+xml")
 
 
-@app.get("/dashboard")
-async def dashboard(request: Request, registry: MetricRegistry = Depends(get_registry)):
-    metric_definitions = [asdict(provider.definition) for provider in registry.all()]
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "metrics": metric_definitions,
-            "refresh_interval": settings.refresh_interval_seconds,
-            "app_name": settings.app_name,
-            "history_limit": settings.history_points_limit,
-        },
+def _render_dashboard() -> str:
+    def url_for(name: str, **path_params: Any) -> str:
+        return app.url_path_for(name, **path_params)
+
+    return templates.get_template("index.html").render(
+        url_for=url_for,
+        metrics=registry.all_definition_dicts(),
+        refresh_interval=settings.refresh_interval_seconds,
+        app_name=settings.app_name,
+        history_limit=settings.history_points_limit,
     )
 
 
+@app.get("/dashboard", response_class=HTMLResponse)
+async def dashboard() -> HTMLResponse:
+    global _DASHBOARD_HTML
+    if _DASHBOARD_HTML is None:
+        _DASHBOARD_HTML = _render_dashboard()
+    return HTMLResponse(_DASHBOARD_HTML)
+
+
 async def _latest_sample(session: AsyncSession, metric_id: str) -> Optional[Dict[str, Any]]:
     stmt = (
-        select(MetricSample)
+        select(*SAMPLE_COLUMNS)
         .where(MetricSample.metric_id == metric_id)
         .order_by(MetricSample.timestamp.desc())
         .limit(1)
     )
     result = await session.execute(stmt)
-    sample: Optional[MetricSample] = result.scalar_one_or_none()
-    return sample.to_dict() if sample else None
+    sample = result.one_or_none()
+    return sample_to_dict(sample) if sample else None
 
 
 async def _history_samples(
     session: AsyncSession, metric_id: str, limit: int
 ) -> List[Dict[str, Any]]:
     stmt = (
-        select(MetricSample)
+        select(*SAMPLE_COLUMNS)
         .where(MetricSample.metric_id == metric_id)
         .order_by(MetricSample.timestamp.desc())
         .limit(limit)
     )
     result = await session.execute(stmt)
-    samples = list(result.scalars())
-    return [sample.to_dict() for sample in reversed(samples)]
+    samples = result.all()
+    return [sample_to_dict(sample) for sample in reversed(samples)]
+
+
+async def _recent_samples(
+    session: AsyncSession, limits: Dict[str, int]
+) -> Dict[str, List[Row[Any]]]:
+    """Fetch the newest samples for several metrics in a single query.
+
+    ``limits`` maps each metric id to the number of samples to keep. Samples are
+    returned newest first, grouped by metric id.
+    """
+    if not limits:
+        return {}
+    # Each metric gets its own ORDER BY ... LIMIT so the composite index stops
+    # the scan after ``limit`` rows, instead of ranking every stored sample.
+    per_metric = [
+        select(*SAMPLE_COLUMNS)
+        .where(MetricSample.metric_id == metric_id)
+        .order_by(MetricSample.timestamp.desc())
+        .limit(limit)
+        .subquery()
+        .select()
+        for metric_id, limit in limits.items()
+    ]
+    combined = union_all(*per_metric).subquery()
+    stmt = select(combined).order_by(
+        combined.c.metric_id, combined.c.timestamp.desc()
+    )
+    result = await session.execute(stmt)
+    grouped: Dict[str, List[Row[Any]]] = defaultdict(list)
+    for sample in result:
+        grouped[sample.metric_id].append(sample)
+    return grouped
+
+
+def _cached_response(key: Tuple[Any, ...]) -> Optional[bytes]:
+    entry = _RESPONSE_CACHE.get(key)
+    if entry is None:
+        return None
+    built_at, content = entry
+    if time.monotonic() - built_at >= settings.sample_interval_seconds:
+        return None
+    last_collected_at = collector.last_collected_at
+    if last_collected_at is not None and built_at < last_collected_at:
+        return None
+    return content
+
+
+async def _build_metrics_payload(
+    session: AsyncSession, registry: MetricRegistry, include_history: bool
+) -> List[Dict[str, Any]]:
+    definitions = registry.all_definition_dicts()
+    limits = {
+        definition["id"]: (
+            settings.history_points_limit
+            if include_history
+            and definition.get("display", {}).get("type") == "timeseries"
+            else 1
+        )
+        for definition in definitions
+    }
+    samples_by_metric = await _recent_samples(session, limits)
+
+    metrics_payload = []
+    for definition in definitions:
+        samples = samples_by_metric.get(definition["id"], [])
+        payload: Dict[str, Any] = {
+            "definition": orjson.Fragment(registry.definition_json(definition["id"])),
+            "latest": sample_to_dict(samples[0]) if samples else None,
+        }
+        if include_history and definition.get("display", {}).get("type") == "timeseries":
+            payload["history"] = [sample_to_dict(sample) for sample in reversed(samples)]
+        metrics_payload.append(payload)
+    return metrics_payload
 
 
 @app.get("/api/metrics")
@@ -114,21 +242,17 @@ async def read_metrics(
     session: AsyncSession = Depends(get_session),
     registry: MetricRegistry = Depends(get_registry),
 ):
-    metrics_payload = []
-    for provider in registry.all():
-        definition = asdict(provider.definition)
-        metric_id = definition["id"]
-        latest = await _latest_sample(session, metric_id)
-        payload: Dict[str, Any] = {
-            "definition": definition,
-            "latest": latest,
-        }
-        if include_history and definition.get("display", {}).get("type") == "timeseries":
-            payload["history"] = await _history_samples(
-                session, metric_id, settings.history_points_limit
+    key = (include_history, settings.history_points_limit)
+    async with _RESPONSE_CACHE_LOCK:
+        content = _cached_response(key)
+        if content is None:
+            built_at = time.monotonic()
+            metrics_payload = await _build_metrics_payload(
+                session, registry, include_history
             )
-        metrics_payload.append(payload)
-    return metrics_payload
+            content = orjson.dumps(metrics_payload)
+            _RESPONSE_CACHE[key] = (built_at, content)
+    return Response(content=content, media_type="application/json")
 
 
 @app.get("/api/metrics/{metric_id}")
@@ -139,7 +263,7 @@ async def read_metric(
     registry: MetricRegistry = Depends(get_registry),
 ):
     try:
-        definition = asdict(registry.get(metric_id).definition)
+        definition = registry.definition_dict(metric_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
@@ -149,14 +273,47 @@ async def read_metric(
         response["history"] = await _history_samples(
             session, metric_id, settings.history_points_limit
         )
-    return response
+    # Returning the response directly skips FastAPI's jsonable_encoder pass.
+    return ORJSONResponse(response)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _iter_history_bytes(
+    metric_id: str, limit: int, ndjson: bool
+) -> AsyncIterator[bytes]:
+    """Yield the newest ``limit`` samples oldest first, one encoded row at a time.
+
+    Dependency sessions are closed before a streamed body is sent, so this opens
+    its own reader session.
+    """
+    newest = (
+        select(*SAMPLE_COLUMNS)
+        .where(MetricSample.metric_id == metric_id)
+        .order_by(MetricSample.timestamp.desc())
+        .limit(limit)
+        .subquery()
+    )
+    stmt = select(newest).order_by(newest.c.timestamp)
+    async with ReaderSessionLocal() as session:
+        result = await session.stream(stmt)
+        if ndjson:
+            async for row in result:
+                yield orjson.dumps(sample_to_dict(row)) + b"\n"
+            return
+        prefix = b"["
+        async for row in result:
+            yield prefix + orjson.dumps(sample_to_dict(row))
+            prefix = b","
+        yield b"]" if prefix == b"," else b"[]"
 
 
 @app.get("/api/metrics/{metric_id}/history")
 async def read_metric_history(
+    request: Request,
     metric_id: str,
     limit: int = Query(settings.history_points_limit, ge=1),
-    session: AsyncSession = Depends(get_session),
     registry: MetricRegistry = Depends(get_registry),
 ):
     try:
@@ -165,7 +322,19 @@ async def read_metric_history(
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
     limit = min(limit, settings.history_points_limit)
-    return await _history_samples(session, metric_id, limit)
+    # A JSON array by default; newline-delimited JSON when the client asks for it.
+    ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    return StreamingResponse(
+        _iter_history_bytes(metric_id, limit, ndjson),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+    )
+
+
+@app.post("/api/snapshot", status_code=202)
+async def request_snapshot():
+    """Record every metric on the next tick, including unchanged ones."""
+    collector.request_full_snapshot()
+    return {"status": "scheduled"}
 
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
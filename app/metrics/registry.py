@@ -1,5 +1,8 @@
 from collections import OrderedDict
-from typing import Iterable, List
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List
+
+import orjson
 
 from .base import MetricProvider, MetricResult
 
@@ -9,12 +12,18 @@ class MetricRegistry:
 
     def __init__(self) -> None:
         self._providers: "OrderedDict[str, MetricProvider]" = OrderedDict()
+        # Definitions are frozen, so their dict/JSON forms are built once here.
+        self._definition_dicts: Dict[str, Dict[str, Any]] = {}
+        self._definition_json: Dict[str, bytes] = {}
 
     def register(self, provider: MetricProvider) -> None:
         definition = provider.definition
         if definition.id in self._providers:
             raise ValueError(f"Metric '{definition.id}' is already registered.")
         self._providers[definition.id] = provider
+        definition_dict = asdict(definition)
+        self._definition_dicts[definition.id] = definition_dict
+        self._definition_json[definition.id] = orjson.dumps(definition_dict)
 
     def all(self) -> Iterable[MetricProvider]:
         return self._providers.values()
@@ -24,6 +33,17 @@ class MetricRegistry:
             raise KeyError(f"Metric '{metric_id}' is not registered.")
         return self._providers[metric_id]
 
+    def definition_dict(self, metric_id: str) -> Dict[str, Any]:
+        self.get(metric_id)
+        return self._definition_dicts[metric_id]
+
+    def definition_json(self, metric_id: str) -> bytes:
+        self.get(metric_id)
+        return self._definition_json[metric_id]
+
+    def all_definition_dicts(self) -> List[Dict[str, Any]]:
+        return [self._definition_dicts[metric_id] for metric_id in self._providers]
+
     def collect_all(self) -> List[MetricResult]:
         return [MetricResult(provider.definition, provider.collect()) for provider in self.all()]
 
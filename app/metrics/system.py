@@ -1,25 +1,43 @@
+import logging
+import math
 import platform
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import psutil
 
 from .base import MetricDefinition, MetricDisplayConfig, MetricProvider
 
+__all__ = [
+    "CPUMetric",
+    "DEFAULT_PROVIDERS",
+    "DiskIOMetric",
+    "DiskMetric",
+    "MemoryMetric",
+    "NetworkMetric",
+    "TemperatureMetric",
+]
+
+logger = logging.getLogger(__name__)
+
+# CPU topology does not change while the process is running.
+_LOGICAL_CORES = psutil.cpu_count()
+_PHYSICAL_CORES = psutil.cpu_count(logical=False)
+
+
+_BYTE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB", "EB")
+
 
 def _format_bytes(value: int) -> str:
-    units = ["B", "KB", "MB", "GB", "TB", "PB", "EB"]
     if value is None:
         return "0 B"
-    negative = value < 0
+    sign = "-" if value < 0 else ""
     size = float(abs(value))
-    for unit in units:
-        if size < 1024.0 or unit == units[-1]:
-            break
-        size /= 1024.0
-    formatted = f"{size:.2f}".rstrip("0").rstrip(".")
-    result = f"{formatted} {unit}"
-    return f"-{result}" if negative else result
+    # Each unit is 2**10 of the previous one, so the binary exponent picks the unit.
+    index = min(max(math.frexp(size)[1] - 1, 0) // 10, len(_BYTE_UNITS) - 1)
+    scaled = size / (1 << (index * 10))
+    formatted = f"{scaled:.2f}".rstrip("0").rstrip(".")
+    return f"{sign}{formatted} {_BYTE_UNITS[index]}"
 
 
 class CPUMetric(MetricProvider):
@@ -35,8 +53,13 @@ class CPUMetric(MetricProvider):
         ),
     )
 
+    def __init__(self) -> None:
+        # Non-blocking calls report usage since the previous call, so prime the
+        # baseline here; each sample then covers one collector interval.
+        psutil.cpu_percent(interval=None, percpu=True)
+
     def collect(self) -> Dict[str, Any]:
-        per_core = psutil.cpu_percent(interval=0.1, percpu=True)
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
         total = (
             sum(per_core) / len(per_core)
             if per_core
@@ -44,10 +67,10 @@ class CPUMetric(MetricProvider):
         )
         return {
             "timestamp": time.time(),
-            "logical_cores": psutil.cpu_count(),
-            "physical_cores": psutil.cpu_count(logical=False),
+            "logical_cores": _LOGICAL_CORES,
+            "physical_cores": _PHYSICAL_CORES,
             "percent_total": total,
-            "percent_per_core": [value for value in per_core],
+            "percent_per_core": per_core,
             "load_average": (
                 list(psutil.getloadavg()) if hasattr(psutil, "getloadavg") else None
             ),
@@ -103,13 +126,30 @@ class DiskMetric(MetricProvider):
         ),
     )
 
+    # Mounts change rarely; only usage needs to be polled every sample.
+    PARTITIONS_REFRESH_SECONDS = 60.0
+
+    def __init__(self) -> None:
+        self._partitions_cache: Tuple[Any, ...] = ()
+        self._partitions_cached_at: Optional[float] = None
+
+    def _partitions(self) -> Tuple[Any, ...]:
+        now = time.monotonic()
+        if (
+            self._partitions_cached_at is None
+            or now - self._partitions_cached_at > self.PARTITIONS_REFRESH_SECONDS
+        ):
+            self._partitions_cache = tuple(psutil.disk_partitions())
+            self._partitions_cached_at = now
+        return self._partitions_cache
+
     def collect(self) -> Dict[str, Any]:
-        partitions = psutil.disk_partitions()
         partition_stats: List[Dict[str, Any]] = []
-        for partition in partitions:
+        for partition in self._partitions():
             try:
                 usage = psutil.disk_usage(partition.mountpoint)
-            except PermissionError:
+            except OSError:
+                # Unreadable, or unmounted since the partition list was cached.
                 continue
             partition_stats.append(
                 {
@@ -155,21 +195,10 @@ class NetworkMetric(MetricProvider):
     def collect(self) -> Dict[str, Any]:
         pernic = psutil.net_io_counters(pernic=True)
         totals = psutil.net_io_counters(pernic=False)
-        interfaces = []
-        for name, stats in pernic.items():
-            interfaces.append(
-                {
-                    "interface": name,
-                    "bytes_sent": stats.bytes_sent,
-                    "bytes_recv": stats.bytes_recv,
-                    "packets_sent": stats.packets_sent,
-                    "packets_recv": stats.packets_recv,
-                    "errin": stats.errin,
-                    "errout": stats.errout,
-                    "dropin": stats.dropin,
-                    "dropout": stats.dropout,
-                }
-            )
+        # snetio carries exactly the per-interface fields the API reports.
+        interfaces = [
+            {"interface": name, **stats._asdict()} for name, stats in pernic.items()
+        ]
 
         return {
             "timestamp": time.time(),
@@ -186,19 +215,22 @@ class NetworkMetric(MetricProvider):
 
 def _aggregate_temperature(
     readings: Dict[str, Any],
-    keywords: List[str],
+    keywords: Tuple[str, ...],
 ) -> Optional[Dict[str, Any]]:
     matches: List[Dict[str, Any]] = []
+    current_sum = 0.0
+    high: Optional[float] = None
+    critical: Optional[float] = None
     for name, entries in readings.items():
         name_lc = name.lower()
         name_matches = any(keyword in name_lc for keyword in keywords)
         for entry in entries:
-            label_lc = (entry.label or "").lower()
-            label_matches = any(keyword in label_lc for keyword in keywords)
-            if not (name_matches or label_matches):
-                continue
             if entry.current is None:
                 continue
+            if not name_matches:
+                label_lc = (entry.label or "").lower()
+                if not any(keyword in label_lc for keyword in keywords):
+                    continue
             matches.append(
                 {
                     "label": entry.label or name,
@@ -207,23 +239,20 @@ def _aggregate_temperature(
                     "critical": entry.critical,
                 }
             )
+            current_sum += entry.current
+            if entry.high is not None and (high is None or entry.high > high):
+                high = entry.high
+            if entry.critical is not None and (
+                critical is None or entry.critical > critical
+            ):
+                critical = entry.critical
     if not matches:
         return None
 
-    current_values = [
-        sample["current"] for sample in matches if sample["current"] is not None
-    ]
-    high_values = [sample["high"] for sample in matches if sample["high"] is not None]
-    critical_values = [
-        sample["critical"] for sample in matches if sample["critical"] is not None
-    ]
-
     return {
-        "current": (
-            sum(current_values) / len(current_values) if current_values else None
-        ),
-        "high": max(high_values) if high_values else None,
-        "critical": max(critical_values) if critical_values else None,
+        "current": current_sum / len(matches),
+        "high": high,
+        "critical": critical,
         "sensors": matches,
     }
 
@@ -244,17 +273,18 @@ class TemperatureMetric(MetricProvider):
         ),
     )
 
-    CPU_KEYWORDS = ["cpu", "core", "package", "soc"]
-    GPU_KEYWORDS = ["gpu", "graphics", "nvidia", "amdgpu", "radeon"]
+    CPU_KEYWORDS = ("cpu", "core", "package", "soc")
+    GPU_KEYWORDS = ("gpu", "graphics", "nvidia", "amdgpu", "radeon")
 
     def collect(self) -> Dict[str, Any]:
         try:
             temps = psutil.sensors_temperatures()
         except (AttributeError, NotImplementedError):
-            print("no temps")
+            logger.debug("Temperature sensors are not supported on this platform")
             temps = {}
 
-        print("temps", temps)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Temperature readings: %r", temps)
 
         cpu_summary = (
             _aggregate_temperature(temps, self.CPU_KEYWORDS) if temps else None
@@ -1,52 +1,50 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+from typing import Any
 
-from sqlalchemy.types import TypeDecorator
-
-from sqlalchemy import DateTime, Integer, JSON, String
+import orjson
+from sqlalchemy import Float, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .db import Base
 
 
-class UTCDateTime(TypeDecorator[datetime]):
-    impl = DateTime(timezone=True)
-    cache_ok = True
-
-    def process_bind_param(
-        self, value: datetime | None, dialect: object
-    ) -> datetime | None:
-        if value is None:
-            return None
-        if value.tzinfo is None:
-            raise ValueError("UTCDateTime only accepts timezone-aware datetimes")
-        return value.astimezone(timezone.utc)
-
-    def process_result_value(
-        self, value: datetime | None, dialect: object
-    ) -> datetime | None:
-        if value is None:
-            return None
-        if value.tzinfo is None:
-            return value.replace(tzinfo=timezone.utc)
-        return value.astimezone(timezone.utc)
-
-
 class MetricSample(Base):
     """Persisted metric sample for historical lookups."""
 
     __tablename__ = "metric_samples"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    metric_id: Mapped[str] = mapped_column(String(100), index=True)
-    timestamp: Mapped[datetime] = mapped_column(UTCDateTime(), index=True)
-    payload: Mapped[dict] = mapped_column(JSON)
+    metric_id: Mapped[str] = mapped_column(String(100))
+    # Unix epoch seconds (UTC), as produced by time.time().
+    timestamp: Mapped[float] = mapped_column(Float)
+    # Collected data, stored already serialized so reads can pass it through.
+    payload_json: Mapped[str] = mapped_column(Text)
+
+    # Lookups always filter on a metric and walk its newest samples first.
+    __table_args__ = (
+        Index("ix_metric_samples_metric_ts", metric_id, timestamp.desc()),
+    )
 
     def to_dict(self) -> dict:
-        return {
-            "id": self.id,
-            "metric_id": self.metric_id,
-            "timestamp": self.timestamp.isoformat(),  # Stored in UTC
-            "data": self.payload,
-        }
+        return sample_to_dict(self)
+
+
+# Columns needed to build API responses; selecting these returns plain rows and
+# skips constructing ORM objects.
+SAMPLE_COLUMNS = (
+    MetricSample.id,
+    MetricSample.metric_id,
+    MetricSample.timestamp,
+    MetricSample.payload_json,
+)
+
+
+def sample_to_dict(sample: Any) -> dict:
+    """Serialize a ``MetricSample`` or a row selected with ``SAMPLE_COLUMNS``."""
+    return {
+        "id": sample.id,
+        "metric_id": sample.metric_id,
+        "timestamp": sample.timestamp,
+        "data": orjson.Fragment(sample.payload_json),  # Raw JSON, orjson only
+    }
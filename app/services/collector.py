@@ -1,13 +1,66 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
-from typing import Optional
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from ..metrics.base import MetricProvider
 from ..metrics.registry import MetricRegistry
 from ..models import MetricSample
+from .retention import RetentionPolicy
+
+logger = logging.getLogger(__name__)
+
+# Batches at least this large are loaded with COPY when running on asyncpg.
+COPY_THRESHOLD = 100
+_COPY_COLUMNS = ("metric_id", "timestamp", "payload_json")
+
+MIN_INTERVAL_SECONDS = 0.01
+
+# Warn once collection has overrun the sample interval this many ticks in a row.
+OVERRUN_WARNING_TICKS = 3
+
+# Upper bound for the retry delay after consecutive failed ticks.
+MAX_FAILURE_BACKOFF_SECONDS = 300.0
+# Caps the backoff exponent so long outages cannot overflow the float delay.
+MAX_FAILURE_BACKOFF_EXPONENT = 16
+
+# A buffered batch is discarded after this many consecutive failed flushes, so a
+# row the database keeps rejecting cannot block every later write.
+MAX_FLUSH_ATTEMPTS = 5
+
+# stop() waits this long (or two intervals, if longer) for an in-flight tick to
+# finish before cancelling it.
+MIN_STOP_GRACE_SECONDS = 1.0
+
+
+def _collect_payload(
+    provider: MetricProvider, fingerprint: bool
+) -> Tuple[str, Optional[int]]:
+    """Collect a provider and encode its data, ready for the payload column.
+
+    With ``fingerprint``, also hash the data minus its ``timestamp`` key so that
+    otherwise identical samples can be recognised.
+    """
+    data = provider.collect()
+    digest: Optional[int] = None
+    if fingerprint:
+        unstamped = {key: value for key, value in data.items() if key != "timestamp"}
+        digest = hash(orjson.dumps(unstamped))
+    return orjson.dumps(data).decode(), digest
+
+
+def _collect_payload_inline(provider: MetricProvider, fingerprint: bool) -> Any:
+    try:
+        return _collect_payload(provider, fingerprint)
+    except Exception as exc:
+        return exc
 
 
 class MetricCollector:
@@ -17,51 +70,329 @@ class MetricCollector:
         self,
         registry: MetricRegistry,
         session_factory: async_sessionmaker[AsyncSession],
-        interval_seconds: int,
+        interval_seconds: float,
+        retention: Optional[RetentionPolicy] = None,
+        collect_in_thread: bool = True,
+        flush_every_ticks: int = 1,
+        flush_interval_seconds: Optional[float] = None,
+        max_skip_ticks: int = 0,
+        max_buffered_rows: int = 10_000,
     ) -> None:
         self.registry = registry
         self.session_factory = session_factory
-        self.interval_seconds = max(interval_seconds, 1)
+        # Sub-second intervals are allowed, though values below ~0.05s may not be
+        # achievable on a busy event loop.
+        self.interval_seconds = max(float(interval_seconds), MIN_INTERVAL_SECONDS)
+        self.collect_in_thread = collect_in_thread
+        self.flush_every_ticks = max(flush_every_ticks, 1)
+        self.flush_interval_seconds = flush_interval_seconds
+        # When positive, a sample whose data matches the previous one is skipped,
+        # but never more than this many ticks in a row.
+        self.max_skip_ticks = max(max_skip_ticks, 0)
+        self._last_fingerprints: Dict[str, int] = {}
+        self._skipped_ticks: Dict[str, int] = {}
+        self._force_full_snapshot = False
+        # Rows collected since the last flush. Buffering several ticks amortizes
+        # the commit, at the cost of losing them if the process dies.
+        self._buffer: List[Dict[str, Any]] = []
+        # While the database is unavailable the oldest rows beyond this are
+        # dropped, so the buffer cannot grow without bound.
+        self.max_buffered_rows = max(max_buffered_rows, 1)
+        self._flush_failures = 0
+        self._buffered_ticks = 0
+        self._buffered_since: Optional[float] = None
+        # Row dicts already written to the database, refilled on later ticks so
+        # steady-state collection does not allocate new ones.
+        self._spare_rows: List[Dict[str, Any]] = []
+        self.retention = retention
+        self._retention_applied_at: Optional[float] = None
         self._task: Optional[asyncio.Task[None]] = None
         self._stop_event = asyncio.Event()
+        # Set by the interval timer or by stop(); wakes the loop without raising.
+        self._wake_event = asyncio.Event()
+        # collect_once() may be called while the background task is running.
+        self._write_lock = asyncio.Lock()
+        # One session for the collector's lifetime, only used under _write_lock
+        # so it is never shared between concurrent tasks.
+        self._exit_stack = AsyncExitStack()
+        self._session: Optional[AsyncSession] = None
+        # Monotonic time of the last committed tick, used to invalidate caches.
+        self.last_collected_at: Optional[float] = None
+        # A Core insert on the table skips the ORM unit of work; building it once
+        # lets every tick hit SQLAlchemy's compiled statement cache.
+        self._insert_stmt = insert(MetricSample.__table__)
 
     def start(self) -> None:
         if self._task is None or self._task.done():
             self._stop_event.clear()
+            self._wake_event.clear()
             self._task = asyncio.create_task(self._run(), name="metric-collector")
 
     async def stop(self) -> None:
         if self._task is None:
             return
         self._stop_event.set()
-        self._task.cancel()
+        self._wake_event.set()
+        # Let an in-flight tick commit instead of cancelling it mid-transaction;
+        # cancel only if the loop does not exit within the grace period.
+        grace = max(2 * self.interval_seconds, MIN_STOP_GRACE_SECONDS)
         try:
-            await self._task
-        except asyncio.CancelledError:
-            pass
+            done, _ = await asyncio.wait({self._task}, timeout=grace)
+            if not done:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # The loop already died; still write out whatever it buffered.
+                logger.exception("Metric collector task ended with an error")
         finally:
             self._task = None
+            try:
+                await self.flush()
+            finally:
+                await self._exit_stack.aclose()
+                self._session = None
 
     async def _run(self) -> None:
+        # Ticks are scheduled against absolute deadlines so that the time spent
+        # collecting does not stretch the sampling period.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        overruns = 0
+        failures = 0
         while not self._stop_event.is_set():
-            await self._collect_once()
             try:
-                await asyncio.wait_for(self._stop_event.wait(), timeout=self.interval_seconds)
-            except asyncio.TimeoutError:
+                await self._collect_once()
+            except Exception:
+                # A transient failure (e.g. a locked database) must not end the
+                # task; buffered rows are kept and retried on the next flush.
+                failures += 1
+                logger.exception("Metric collection failed (%d in a row)", failures)
+                backoff = min(
+                    self.interval_seconds
+                    * 2 ** min(failures - 1, MAX_FAILURE_BACKOFF_EXPONENT),
+                    max(MAX_FAILURE_BACKOFF_SECONDS, self.interval_seconds),
+                )
+                deadline = loop.time() + backoff
+                await self._sleep_until(deadline)
                 continue
+            failures = 0
+            if self._stop_event.is_set():
+                break
+            await self._apply_retention_if_due()
+            deadline += self.interval_seconds
+            now = loop.time()
+            if deadline <= now:
+                overruns += 1
+                if overruns == OVERRUN_WARNING_TICKS:
+                    logger.warning(
+                        "Metric collection is taking longer than the %ss interval",
+                        self.interval_seconds,
+                    )
+                # Skip the missed ticks rather than collecting in a burst.
+                deadline = now
+            else:
+                overruns = 0
+            await self._sleep_until(deadline)
+
+    async def _sleep_until(self, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        timer = loop.call_at(deadline, self._wake_event.set)
+        try:
+            await self._wake_event.wait()
+        finally:
+            timer.cancel()
+            self._wake_event.clear()
 
     async def collect_once(self) -> None:
-        await self._collect_once()
-
-    async def _collect_once(self) -> None:
-        results = self.registry.collect_all()
-        timestamp = datetime.now(timezone.utc)
-        async with self.session_factory() as session:
-            async with session.begin():
-                for result in results:
-                    sample = MetricSample(
-                        metric_id=result.definition.id,
-                        timestamp=timestamp,
-                        payload=result.data,
+        """Collect a single tick and write it, along with any buffered rows."""
+        await self._collect_once(flush=True)
+
+    def request_full_snapshot(self) -> None:
+        """Record every metric on the next tick, even if unchanged."""
+        self._force_full_snapshot = True
+
+    async def flush(self) -> None:
+        async with self._write_lock:
+            await self._flush_buffer()
+
+    async def _collect_results(
+        self,
+    ) -> Tuple[List[str], List[str], List[Optional[int]]]:
+        """Return parallel lists of metric ids, payloads and fingerprints.
+
+        Only providers that collected successfully are included.
+        """
+        providers = list(self.registry.all())
+        fingerprint = self.max_skip_ticks > 0
+        if self.collect_in_thread:
+            # Providers are independent and mostly block on syscalls, so run them
+            # (and encode their payloads) side by side in worker threads instead
+            # of serially on the loop.
+            outcomes = await asyncio.gather(
+                *(
+                    asyncio.to_thread(_collect_payload, provider, fingerprint)
+                    for provider in providers
+                ),
+                return_exceptions=True,
+            )
+        else:
+            outcomes = [
+                _collect_payload_inline(provider, fingerprint) for provider in providers
+            ]
+        metric_ids: List[str] = []
+        payloads: List[str] = []
+        digests: List[Optional[int]] = []
+        for provider, outcome in zip(providers, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(
+                    "Failed to collect metric '%s'",
+                    provider.definition.id,
+                    exc_info=outcome,
+                )
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            payload_json, digest = outcome
+            metric_ids.append(provider.definition.id)
+            payloads.append(payload_json)
+            digests.append(digest)
+        return metric_ids, payloads, digests
+
+    async def _collect_once(self, flush: bool = False) -> None:
+        async with self._write_lock:
+            metric_ids, payloads, digests = await self._collect_results()
+            if not metric_ids:
+                logger.debug("No metric results collected; nothing to record")
+            else:
+                timestamp = time.time()
+                spare_rows = self._spare_rows
+                force_full_snapshot = self._force_full_snapshot
+                self._force_full_snapshot = False
+                for metric_id, payload_json, digest in zip(
+                    metric_ids, payloads, digests
+                ):
+                    if self._is_repeat(metric_id, digest, force_full_snapshot):
+                        continue
+                    row = spare_rows.pop() if spare_rows else {}
+                    row["metric_id"] = metric_id
+                    row["timestamp"] = timestamp
+                    row["payload_json"] = payload_json
+                    self._buffer.append(row)
+                self._trim_buffer()
+                self._buffered_ticks += 1
+                if self._buffered_since is None:
+                    self._buffered_since = time.monotonic()
+            if flush or self._flush_due():
+                await self._flush_buffer()
+
+    def _is_repeat(
+        self, metric_id: str, digest: Optional[int], force: bool = False
+    ) -> bool:
+        """Whether to skip this sample; ``force`` records it regardless."""
+        if digest is None:
+            return False
+        skipped = self._skipped_ticks.get(metric_id, 0)
+        if (
+            not force
+            and self._last_fingerprints.get(metric_id) == digest
+            and skipped < self.max_skip_ticks
+        ):
+            self._skipped_ticks[metric_id] = skipped + 1
+            return True
+        self._last_fingerprints[metric_id] = digest
+        self._skipped_ticks[metric_id] = 0
+        return False
+
+    def _trim_buffer(self) -> None:
+        excess = len(self._buffer) - self.max_buffered_rows
+        if excess <= 0:
+            return
+        logger.warning(
+            "Dropping %d buffered samples; the buffer is limited to %d rows",
+            excess,
+            self.max_buffered_rows,
+        )
+        self._spare_rows.extend(self._buffer[:excess])
+        del self._buffer[:excess]
+
+    def _flush_due(self) -> bool:
+        if self._buffered_ticks >= self.flush_every_ticks:
+            return True
+        return (
+            self.flush_interval_seconds is not None
+            and self._buffered_since is not None
+            and time.monotonic() - self._buffered_since >= self.flush_interval_seconds
+        )
+
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self.session_factory()
+            self._exit_stack.push_async_callback(self._session.close)
+        return self._session
+
+    async def _flush_buffer(self) -> None:
+        if self._buffer:
+            session = self._get_session()
+            try:
+                async with session.begin():
+                    await self._write_rows(session, self._buffer)
+            except Exception:
+                self._flush_failures += 1
+                if self._flush_failures >= MAX_FLUSH_ATTEMPTS:
+                    logger.error(
+                        "Discarding %d buffered samples after %d failed flushes",
+                        len(self._buffer),
+                        self._flush_failures,
                     )
-                    session.add(sample)
+                    self._flush_failures = 0
+                    self._spare_rows.extend(self._buffer)
+                    self._buffer.clear()
+                    self._buffered_ticks = 0
+                    self._buffered_since = None
+                raise
+            self._flush_failures = 0
+            self._spare_rows.extend(self._buffer)
+            self._buffer.clear()
+            self.last_collected_at = time.monotonic()
+        self._buffered_ticks = 0
+        self._buffered_since = None
+
+    async def _write_rows(
+        self, session: AsyncSession, rows: List[Dict[str, Any]]
+    ) -> None:
+        if len(rows) >= COPY_THRESHOLD and session.bind.dialect.driver == "asyncpg":
+            connection = await session.connection()
+            # The asyncpg adapter only opens its transaction on the first
+            # statement; without one the COPY would autocommit on its own.
+            await connection.exec_driver_sql("SELECT 1")
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                MetricSample.__tablename__,
+                records=[tuple(row[column] for column in _COPY_COLUMNS) for row in rows],
+                columns=list(_COPY_COLUMNS),
+            )
+            return
+        await session.execute(self._insert_stmt, rows)
+
+    async def _apply_retention_if_due(self) -> None:
+        if self.retention is None:
+            return
+        now = time.monotonic()
+        if (
+            self._retention_applied_at is not None
+            and now - self._retention_applied_at < self.retention.interval_seconds
+        ):
+            return
+        # A failed run is stamped too, so it is retried on the retention
+        # schedule without slowing down collection.
+        self._retention_applied_at = now
+        try:
+            async with self._write_lock:
+                session = self._get_session()
+                async with session.begin():
+                    await self.retention.apply(session, time.time())
+        except Exception:
+            logger.exception("Applying the retention policy failed")
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Optional
+
+from sqlalchemy import Integer, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..models import MetricSample
+
+
+class _epoch_bucket(FunctionElement[int]):
+    """Index of the ``seconds``-wide bucket an epoch timestamp falls into."""
+
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(_epoch_bucket)
+def _compile_epoch_bucket(element: _epoch_bucket, compiler: Any, **kw: Any) -> str:
+    timestamp, seconds = element.clauses
+    return (
+        f"floor({compiler.process(timestamp, **kw)}"
+        f" / {compiler.process(seconds, **kw)})"
+    )
+
+
+@compiles(_epoch_bucket, "sqlite")
+def _compile_epoch_bucket_sqlite(
+    element: _epoch_bucket, compiler: Any, **kw: Any
+) -> str:
+    # floor() is optional in SQLite builds; CAST truncates, which matches it
+    # for the non-negative timestamps stored here.
+    timestamp, seconds = element.clauses
+    return (
+        f"CAST({compiler.process(timestamp, **kw)}"
+        f" / {compiler.process(seconds, **kw)} AS INTEGER)"
+    )
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Thins out old samples so the table stays bounded in size.
+
+    Samples newer than ``raw_retention`` are kept as collected. Older samples are
+    reduced to the newest one per minute, and samples older than
+    ``minute_retention`` to the newest one per hour.
+    """
+
+    raw_retention: timedelta
+    minute_retention: timedelta
+    interval_seconds: float
+
+    def __post_init__(self) -> None:
+        # Otherwise the minute tier is empty and the hourly tier would thin out
+        # samples that are still inside the raw retention window.
+        if self.raw_retention > self.minute_retention:
+            raise ValueError(
+                f"raw_retention ({self.raw_retention}) must not exceed "
+                f"minute_retention ({self.minute_retention})"
+            )
+
+    async def apply(self, session: AsyncSession, now: float) -> int:
+        """Delete samples superseded by the downsampling policy.
+
+        ``now`` is in Unix epoch seconds. Returns the number of deleted rows.
+        """
+        raw_cutoff = now - self.raw_retention.total_seconds()
+        minute_cutoff = now - self.minute_retention.total_seconds()
+        tiers = (
+            (minute_cutoff, raw_cutoff, 60),
+            (None, minute_cutoff, 3600),
+        )
+        deleted = 0
+        for newer_than, older_than, bucket_seconds in tiers:
+            deleted += await self._downsample(
+                session, newer_than, older_than, bucket_seconds
+            )
+        return deleted
+
+    async def _downsample(
+        self,
+        session: AsyncSession,
+        newer_than: Optional[float],
+        older_than: float,
+        bucket_seconds: int,
+    ) -> int:
+        window = [MetricSample.timestamp < older_than]
+        if newer_than is not None:
+            window.append(MetricSample.timestamp >= newer_than)
+        keep = (
+            select(func.max(MetricSample.id))
+            .where(*window)
+            .group_by(
+                MetricSample.metric_id,
+                _epoch_bucket(MetricSample.timestamp, bucket_seconds),
+            )
+        )
+        stmt = delete(MetricSample).where(*window, MetricSample.id.not_in(keep))
+        result = await session.execute(stmt)
+        return result.rowcount or 0
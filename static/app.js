@@ -313,7 +313,7 @@ function updateChart(entry, history) {
     const color = palette[index % palette.length];
     const dataPoints = historySamples
       .map((sample) => {
-        const epoch = Date.parse(sample.timestamp);
+        const epoch = timestampToMillis(sample.timestamp);
         const rawValue = getByPath(sample.data, path);
         const value =
           typeof rawValue === "number"
@@ -387,8 +387,13 @@ function formatMetric(data, timestamp) {
   };
 }
 
+function timestampToMillis(timestamp) {
+  // The API reports Unix epoch seconds.
+  return typeof timestamp === "number" ? timestamp * 1000 : Date.parse(timestamp);
+}
+
 function formatTimestampInfo(timestamp) {
-  const date = new Date(timestamp);
+  const date = new Date(timestampToMillis(timestamp));
   if (!Number.isFinite(date.getTime())) {
     return {
       local: "Invalid time",
@@ -0,0 +1,12 @@
+from app.metrics.registry import MetricRegistry
+from app.metrics.system import DEFAULT_PROVIDERS
+
+
+def test_default_providers_have_unique_ids() -> None:
+    registry = MetricRegistry()
+    for provider in DEFAULT_PROVIDERS:
+        registry.register(provider)
+
+    assert [provider.definition.id for provider in registry.all()] == [
+        provider.definition.id for provider in DEFAULT_PROVIDERS
+    ]